@@ -1,13 +1,50 @@
 import os
 import sys
+import asyncio
+import io
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import hashlib
+import sqlite3
+import threading
+import time
+import re
 import argparse
-from langgraph.graph import StateGraph, END
-from typing import List, Dict, Any, TypedDict, Optional, Union
+import heapq
+import gzip
+from collections import Counter
+from functools import lru_cache, wraps
+from itertools import islice
+from operator import itemgetter
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import Callable, Iterable, Iterator, List, Dict, Any, TypedDict, Optional, Set, Tuple, Union
 
-# Import for Gemini LLM integration
-import google.generativeai as genai
+# Use orjson for faster JSON parsing and serialization when it is installed (all variants produce/accept bytes)
+try:
+    import orjson
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+
+    def _json_dumps_pretty(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+except ImportError:
+    _json_loads = json.loads
+
+    def _json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+    def _json_dumps_pretty(obj: Any) -> bytes:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+
+# Use an Aho-Corasick automaton for keyword matching when pyahocorasick is installed
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
 
 class Hotel(TypedDict):
     name: str
@@ -23,37 +60,156 @@ class HotelContext(TypedDict, total=False):
     checkin: str
     checkout: str
     guests: int
-    keywords: List[str]
+    keywords: List[str]  # normalized to lowercase by the orchestrator
     google_data: Dict[str, Any]
+    review_count: int
     combined_hotels: Dict[str, Any]
     top_hotels: List[Hotel]
 
 # ========== CONFIGURATION ==========
 MCP_BASE_URL = "http://localhost:3002"
 
+# Print diagnostic summaries (e.g. review counts); disable with HOTEL_AGENT_VERBOSE=0
+VERBOSE = os.environ.get("HOTEL_AGENT_VERBOSE", "1") != "0"
+
+# Connect/read timeouts (seconds) for requests to the MCP server; the read timeout must exceed the server's
+# own scrape budget (/hotels can wait 60s on Bright Data and another 60s on its fallback scrape)
+MCP_TIMEOUT = (3.05, 150)
+
+# Shared HTTP session so requests to the MCP server reuse pooled keep-alive connections
+# (rate-limited requests and gateway errors are retried with exponential backoff, honouring Retry-After;
+# a 500 from the server means both of its scrape attempts already failed, so it isn't retried)
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    # read=0: a request that timed out after being sent may still be scraping, so don't pay for it again
+    max_retries=Retry(total=3, read=0, backoff_factor=0.3, status_forcelist=[429, 502, 503, 504]),
+))
+
+# Maximum number of hotel review fetches and Gemini analyses memoized per process
+CACHE_MAXSIZE = 512
+
+# Persistent cache of MCP responses and Gemini analyses shared across runs. Entries older than
+# the TTL (checked when they are read) are not reused; a TTL of 0 disables the cache
+CACHE_PATH = os.path.join(".cache", "hotel_agent.sqlite3")
+CACHE_TTL = 24 * 60 * 60
+
+# Gemini analyses depend only on review content, so they are kept longer. Bump the prompt
+# version whenever the analysis prompts change so stale analyses are not reused.
+ANALYSIS_CACHE_TTL = 7 * 24 * 60 * 60
+GEMINI_PROMPT_VERSION = 2
+
+# Version tag of the pipeline; part of the in-process search memo key so a reloaded pipeline isn't served stale results
+GRAPH_VERSION = 1
+
+# Buffer size for stdout when it is redirected to a file or pipe
+STDOUT_BUFFER_SIZE = 64 * 1024
+
+# Number of hotel blocks the rankings report accumulates before they are joined and written out
+REPORT_CHUNK_HOTELS = 256
+
+# Maximum number of hotel review requests sent to the MCP server at once
+REVIEW_FETCH_MAX_WORKERS = 8
+
+# Maximum number of hotels scored concurrently by the scorer agent
+SCORER_MAX_WORKERS = 8
+
+# Hotels with fewer reviews or less review text than this are analyzed locally instead of with Gemini
+MIN_REVIEWS_FOR_GEMINI = 3
+MIN_REVIEW_CHARS_FOR_GEMINI = 500
+
+# Prompts whose formatted review content is shorter than this fall back to local analysis
+MIN_PROMPT_REVIEW_CHARS = 200
+
+# Number of hotels analyzed per batched Gemini request
+GEMINI_BATCH_SIZE = 5
+
+# Reviews per hotel sent to Gemini, and the character cap applied to each review to limit prompt tokens
+GEMINI_MAX_REVIEWS = 10
+GEMINI_REVIEW_CHARS = 400
+
 # Gemini API configuration
 GEMINI_API_KEY = ""
 
-# Configure Gemini API
-genai.configure(api_key=GEMINI_API_KEY)
-
 # Define the model name (use the standard gemini-pro model which is widely available)
 GEMINI_MODEL = "gemini-2.0-flash"
-gemini_model = genai.GenerativeModel(model_name=GEMINI_MODEL)
+
+
+@lru_cache(maxsize=1)
+def _gemini_model():
+    """Import, configure and create the Gemini model on first use, keeping the SDK import off the CLI startup path."""
+    # Import for Gemini LLM integration
+    import google.generativeai as genai
+    
+    # Configure Gemini API
+    genai.configure(api_key=GEMINI_API_KEY)
+    return genai.GenerativeModel(model_name=GEMINI_MODEL)
+
+# Sentiment lexicons for local review analysis. Reviews are matched by whole token, so inflected
+# forms are listed explicitly; negated phrases are matched as "not <word>" tokens
+POSITIVE_WORDS = frozenset({
+    'good', 'great', 'greater', 'greatest', 'excellent', 'excellently', 'amazing', 'amazed', 'amazingly',
+    'love', 'loved', 'loves', 'loving', 'lovely', 'best', 'perfect', 'perfectly', 'wonderful', 'wonderfully',
+    'fantastic', 'fantastically', 'awesome',
+})
+NEGATIVE_WORDS = frozenset({
+    'bad', 'badly', 'poor', 'poorly', 'terrible', 'terribly', 'awful', 'awfully', 'worse', 'worst',
+    'horrible', 'horribly', 'disappoint', 'disappoints', 'disappointing', 'disappointed', 'disappointment',
+    'not good', 'not great',
+})
+
+# Matches a Gemini answer wrapped in a markdown code block (optionally tagged json) and captures its body
+_CODE_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*(.*?)\s*```\s*$", re.S)
+
+# Runs of whitespace, collapsed when fingerprinting review text for deduplication
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Splits lowercased review text into word tokens, keeping "not" attached to the word it negates
+_TOKEN_RE = re.compile(r"(?:not )?[a-z']+")
+
+
+@lru_cache(maxsize=64)
+def _compile_words_matcher(words: tuple) -> Optional[Callable[[str], Set[str]]]:
+    """
+    Build a function returning which of the given lowercase words occur as substrings of lowercased text (cached per word tuple).
+    
+    Every occurrence is found in a single pass over the text, including words that overlap or contain one another.
+    """
+    words = {w for w in words if w}
+    if not words:
+        return None
+    
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for word in words:
+            automaton.add_word(word, word)
+        automaton.make_automaton()
+        return lambda text: {word for _, word in automaton.iter(text)}
+    
+    # Fallback: a zero-width lookahead tries the longest word at every position, and any shorter
+    # word contained in a match necessarily occurs in the text as well
+    alternatives = sorted(words, key=len, reverse=True)
+    pattern = re.compile("(?=(" + "|".join(map(re.escape, alternatives)) + "))")
+    contained = {w: frozenset(v for v in words if v in w) for w in words}
+    return lambda text: set().union(*(contained[m] for m in set(pattern.findall(text))))
+
 
 # Define a function to analyze reviews without relying solely on external APIs
 def analyze_reviews_locally(reviews, keywords):
-    """Analyze hotel reviews locally without using external APIs."""
+    """Analyze hotel reviews locally without using external APIs. Keywords are expected in lowercase."""
     # Initialize scores
     scores = {keyword: 0 for keyword in keywords}
     mentions = {keyword: 0 for keyword in keywords}
     
-    # Count keyword mentions in reviews
-    for review in reviews:
-        review_text = review.get('text', '').lower()
-        for keyword in keywords:
-            if keyword.lower() in review_text:
-                mentions[keyword] += 1
+    # Count keyword mentions in reviews with a single scan of each review
+    match_keywords = _compile_words_matcher(tuple(keywords))
+    review_hits = Counter()
+    if match_keywords:
+        for review in reviews:
+            review_hits.update(match_keywords(review.get('text', '').lower()))
+    for keyword in keywords:
+        mentions[keyword] = review_hits[keyword]
     
     # Calculate scores based on mentions
     for keyword in keywords:
@@ -73,7 +229,110 @@ def analyze_reviews_locally(reviews, keywords):
     }
 
 # ========== UTILS ==========
-def brightdata_mcp_query(location="New York", checkin="2025-05-01", checkout="2025-05-03", guests=2, keywords=None) -> Dict[str, Any]:
+_cache_lock = threading.Lock()
+_cache_conn = None
+
+
+def _cache_connection() -> sqlite3.Connection:
+    """Open (once) the SQLite cache database, creating it if needed. Must be called with _cache_lock held."""
+    global _cache_conn
+    if _cache_conn is None:
+        os.makedirs(os.path.dirname(CACHE_PATH) or ".", exist_ok=True)
+        _cache_conn = sqlite3.connect(CACHE_PATH, check_same_thread=False)
+        # Entries record when they were written, so the TTL in force when reading decides how old they may be
+        _cache_conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, ts REAL NOT NULL)")
+        # Drop the table of the earlier layout, which stored a fixed expiry time per entry instead
+        _cache_conn.execute("DROP TABLE IF EXISTS cache")
+    return _cache_conn
+
+
+def _cache_get(key: str, ttl: Optional[float] = None) -> Optional[Any]:
+    """Return the cached value for key, or None if it is missing or older than ttl seconds (CACHE_TTL by default)."""
+    with _cache_lock:
+        row = _cache_connection().execute("SELECT value, ts FROM entries WHERE key = ?", (key,)).fetchone()
+    if row is None or time.time() - row[1] > (CACHE_TTL if ttl is None else ttl):
+        return None
+    return _json_loads(row[0])
+
+
+def _cache_set(key: str, value: Any) -> None:
+    """Store a JSON-serializable value under key, stamped with the current time."""
+    with _cache_lock:
+        conn = _cache_connection()
+        conn.execute("INSERT OR REPLACE INTO entries (key, value, ts) VALUES (?, ?, ?)",
+                     (key, _json_dumps(value), time.time()))
+        conn.commit()
+
+
+def persistent_cache(namespace: str, ttl: Optional[float] = None, quiet: bool = False):
+    """
+    Decorator caching a function's JSON result on disk across runs, keyed on its arguments.
+    
+    Entries are reused for ttl seconds after being written (CACHE_TTL by default). Exceptions are not cached,
+    and cache errors never fail the wrapped call. With quiet=True cache hits aren't announced,
+    for functions whose callers log on their own (e.g. into a per-hotel log buffer).
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if CACHE_TTL <= 0:
+                return func(*args, **kwargs)
+            
+            payload = json.dumps([args, kwargs], sort_keys=True, default=str)
+            key = f"{namespace}:{hashlib.sha1(payload.encode()).hexdigest()}"
+            try:
+                cached = _cache_get(key, ttl)
+            except Exception as e:
+                print(f"Error reading {namespace} cache: {e}")
+                cached = None
+            if cached is not None:
+                if not quiet:
+                    print(f"Using cached {namespace} result")
+                return cached
+            
+            result = func(*args, **kwargs)
+            try:
+                _cache_set(key, result)
+            except Exception as e:
+                print(f"Error writing {namespace} cache: {e}")
+            return result
+        return wrapper
+    return decorator
+
+
+# Review source the MCP server gives the made-up reviews it returns when a scrape fails
+_SAMPLE_REVIEW_SOURCE = "sample_data"
+
+
+def _has_sample_reviews(reviews: Iterable[Dict[str, Any]]) -> bool:
+    """Whether any of the reviews is one of the MCP server's made-up sample reviews."""
+    return any(review.get("source") == _SAMPLE_REVIEW_SOURCE for review in reviews)
+
+
+def _is_fallback_response(response: Dict[str, Any]) -> bool:
+    """
+    Whether an MCP server response stands in for a failed scrape rather than holding real data.
+    
+    The server explains such answers in a "note" (sample reviews, alternative data source),
+    and /hotels answers an unproductive scrape with an empty hotel list.
+    """
+    if "note" in response:
+        return True
+    results = response.get("results") or {}
+    if "hotels" in results and not results["hotels"]:
+        return True
+    return _has_sample_reviews(results.get("reviews", ()))
+
+
+class _FallbackResponse(Exception):
+    """Raised out of a cached MCP fetch so a fallback answer isn't cached on disk or in process; carries the response."""
+    
+    def __init__(self, response: Dict[str, Any]):
+        super().__init__("MCP server returned fallback data")
+        self.response = response
+
+
+def brightdata_mcp_query(location="New York", checkin="2025-05-01", checkout="2025-05-03", guests=2, keywords=None, use_cache=True) -> Dict[str, Any]:
     """
     Query the local Express proxy server at /hotels with query parameters.
     
@@ -83,10 +342,21 @@ def brightdata_mcp_query(location="New York", checkin="2025-05-01", checkout="20
         checkout: Check-out date (YYYY-MM-DD)
         guests: Number of guests
         keywords: Optional list of keywords to filter hotel reviews by
+        use_cache: Whether a response cached by an earlier identical query may be used instead of a new request
         
     Returns:
         JSON response containing hotel data
     """
+    query = _brightdata_mcp_query_cached if use_cache else _brightdata_mcp_query_cached.__wrapped__
+    try:
+        return query(location, checkin, checkout, guests, keywords)
+    except _FallbackResponse as e:
+        return e.response
+
+
+@persistent_cache("mcp-hotels")
+def _brightdata_mcp_query_cached(location, checkin, checkout, guests, keywords) -> Dict[str, Any]:
+    """Query /hotels, cached on disk; fallback answers are raised as _FallbackResponse so they aren't cached."""
     params = {
         "location": location,
         "checkin": checkin,
@@ -99,9 +369,12 @@ def brightdata_mcp_query(location="New York", checkin="2025-05-01", checkout="20
         params["keywords"] = ",".join(keywords)
     
     print(f"Looking for hotels in {location} with keywords: {', '.join(keywords) if keywords else 'None'}")
-    response = requests.get(f"{MCP_BASE_URL}/hotels", params=params)
+    response = _SESSION.get(f"{MCP_BASE_URL}/hotels", params=params, timeout=MCP_TIMEOUT)
     response.raise_for_status()
-    return response.json()
+    result = _json_loads(response.content)
+    if _is_fallback_response(result):
+        raise _FallbackResponse(result)
+    return result
 
 
 def fetch_hotel_reviews(hotel_name, location, booking_url=None, keywords=None) -> Dict[str, Any]:
@@ -119,6 +392,27 @@ def fetch_hotel_reviews(hotel_name, location, booking_url=None, keywords=None) -
     Returns:
         JSON response containing detailed hotel reviews
     """
+    try:
+        print(f"Fetching detailed reviews for {hotel_name} in {location}...")
+        keywords_key = tuple(keywords) if keywords and isinstance(keywords, list) else ()
+        try:
+            result = _fetch_hotel_reviews_cached(hotel_name, location, booking_url, keywords_key)
+        except _FallbackResponse as e:
+            result = e.response
+        
+        review_count = len(result.get("results", {}).get("reviews", []))
+        print(f"Found {review_count} detailed reviews for {hotel_name}")
+        
+        return result
+    except Exception as e:
+        print(f"Error fetching hotel reviews: {e}")
+        return {"error": str(e), "results": {"reviews": []}}
+
+
+@lru_cache(maxsize=CACHE_MAXSIZE)
+@persistent_cache("mcp-reviews")
+def _fetch_hotel_reviews_cached(hotel_name: str, location: str, booking_url: Optional[str], keywords: tuple) -> Dict[str, Any]:
+    """Fetch reviews from /hotel-reviews, memoized so repeated hotels are only scraped once. Errors and fallback answers are not cached."""
     params = {
         "hotelName": hotel_name,
         "location": location,
@@ -129,25 +423,26 @@ def fetch_hotel_reviews(hotel_name, location, booking_url=None, keywords=None) -
         params["bookingUrl"] = booking_url
     
     # Add keywords parameter if provided
-    if keywords and isinstance(keywords, list) and len(keywords) > 0:
+    if keywords:
         params["keywords"] = ",".join(keywords)
     
-    try:
-        print(f"Fetching detailed reviews for {hotel_name} in {location}...")
-        response = requests.get(f"{MCP_BASE_URL}/hotel-reviews", params=params)
-        response.raise_for_status()
-        result = response.json()
-        
-        review_count = len(result.get("results", {}).get("reviews", []))
-        print(f"Found {review_count} detailed reviews for {hotel_name}")
-        
-        return result
-    except Exception as e:
-        print(f"Error fetching hotel reviews: {e}")
-        return {"error": str(e), "results": {"reviews": []}}
+    response = _SESSION.get(f"{MCP_BASE_URL}/hotel-reviews", params=params, timeout=MCP_TIMEOUT)
+    response.raise_for_status()
+    result = _json_loads(response.content)
+    if _is_fallback_response(result):
+        raise _FallbackResponse(result)
+    return result
+
+
+def _log(log: Optional[List[str]], message: str) -> None:
+    """Append message to a caller's log buffer, or print it when there is none."""
+    if log is None:
+        print(message)
+    else:
+        log.append(message)
 
 
-def analyze_hotel_reviews(hotel_name: str, reviews: List[Dict[str, Any]], keywords: List[str]) -> Dict[str, Any]:
+def analyze_hotel_reviews(hotel_name: str, reviews: List[Dict[str, Any]], keywords: List[str], log: Optional[List[str]] = None) -> Dict[str, Any]:
     """
     Analyze hotel reviews using Gemini Pro to generate scores and insights.
     
@@ -155,13 +450,14 @@ def analyze_hotel_reviews(hotel_name: str, reviews: List[Dict[str, Any]], keywor
         hotel_name: Name of the hotel being analyzed
         reviews: List of review objects containing text and other metadata
         keywords: List of keywords to focus on in the analysis
+        log: Optional list that progress messages are appended to instead of being printed
         
     Returns:
         Dictionary containing scores and analysis
     """
     # If no reviews are available, return default values
     if not reviews:
-        print(f"No reviews available for {hotel_name}. Skipping analysis.")
+        _log(log, f"No reviews available for {hotel_name}. Skipping analysis.")
         return {
             "overall_score": 0.0,
             "aspect_scores": {},
@@ -170,41 +466,50 @@ def analyze_hotel_reviews(hotel_name: str, reviews: List[Dict[str, Any]], keywor
             "weaknesses": []
         }
     
-    # If we have very few reviews, use a simpler approach without Gemini
-    if len(reviews) < 2:
-        print(f"Only {len(reviews)} reviews available for {hotel_name}. Using simplified analysis.")
-        return analyze_reviews_with_local_method(hotel_name, reviews, keywords)
+    # If we have very few reviews or little review text, use a simpler approach without Gemini
+    if not _worth_gemini_analysis(reviews):
+        _log(log, f"Only {len(reviews)} short reviews available for {hotel_name}. Using simplified analysis.")
+        return analyze_reviews_with_local_method(hotel_name, reviews, keywords, log)
     
     # For hotels with sufficient reviews, try using Gemini first
     try:
-        print(f"Analyzing {len(reviews)} reviews for {hotel_name} with Gemini Pro...")
-        gemini_analysis = analyze_reviews_with_gemini(hotel_name, reviews, keywords)
+        _log(log, f"Analyzing {len(reviews)} reviews for {hotel_name} with Gemini Pro...")
+        gemini_analysis = analyze_reviews_with_gemini(hotel_name, reviews, keywords, log)
         return gemini_analysis
     except Exception as e:
-        print(f"Error using Gemini for {hotel_name}: {e}. Falling back to local analysis.")
-        return analyze_reviews_with_local_method(hotel_name, reviews, keywords)
+        _log(log, f"Error using Gemini for {hotel_name}: {e}. Falling back to local analysis.")
+        return analyze_reviews_with_local_method(hotel_name, reviews, keywords, log)
 
 
-def analyze_reviews_with_gemini(hotel_name: str, reviews: List[Dict[str, Any]], keywords: List[str]) -> Dict[str, Any]:
-    """Analyze hotel reviews using Gemini Pro."""
-    # Prepare review texts for Gemini
-    review_texts = []
-    for i, review in enumerate(reviews[:10]):  # Limit to 10 reviews to avoid token limits
-        review_text = review.get('text', '')
-        if review_text:
-            rating = review.get('rating', 'N/A')
-            review_texts.append(f"Review {i+1} (Rating: {rating}): {review_text}")
+def _worth_gemini_analysis(reviews: List[Dict[str, Any]]) -> bool:
+    """Whether a hotel has enough reviews and review text to justify a Gemini call."""
+    if len(reviews) < MIN_REVIEWS_FOR_GEMINI:
+        return False
+    return sum(len(review.get('text', '')) for review in reviews) >= MIN_REVIEW_CHARS_FOR_GEMINI
+
+
+def analyze_reviews_with_gemini(hotel_name: str, reviews: List[Dict[str, Any]], keywords: List[str], log: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Analyze hotel reviews using Gemini Pro, appending progress messages to log if given (else printing them)."""
+    # Prepare review texts for Gemini and join them into a single string
+    reviews_content = "\n\n".join(_prompt_review_texts(reviews))
     
-    # Join reviews into a single string
-    reviews_content = "\n\n".join(review_texts)
+    # Don't spend a Gemini round-trip on (nearly) empty review content
+    if len(reviews_content) < MIN_PROMPT_REVIEW_CHARS:
+        _log(log, f"Too little review text for {hotel_name} to send to Gemini Pro. Using local analysis.")
+        return analyze_reviews_with_local_method(hotel_name, reviews, keywords, log)
     
-    # Create a prompt for Gemini
-    prompt = f"""You are a hotel review analyst. Analyze these reviews for '{hotel_name}' and provide scores and insights.
+    # The memoized call doesn't log itself (a cache hit would skip its messages), so log around it
+    _log(log, f"Requesting Gemini Pro analysis of {len(reviews_content)} characters of review content...")
+    # Copy the memoized analysis so callers can't mutate the cached entry
+    analysis = dict(_analyze_reviews_content_with_gemini(hotel_name, reviews_content, tuple(keywords)))
+    _log(log, f"Gemini Pro analysis complete for {hotel_name}")
+    return analysis
 
-Focus on these aspects: {', '.join(keywords)}
 
-Reviews:
-{reviews_content}
+# Static analyst instructions placed at the start of every prompt so that consecutive requests share
+# an identical prefix, which Gemini's implicit context caching can reuse across hotels. Prompts continue
+# from least to most variable: the aspects (fixed for a search), then the hotel and its reviews
+_ANALYSIS_INSTRUCTIONS = """You are a hotel review analyst. Analyze the reviews of the hotel given at the end of this prompt and provide scores and insights.
 
 Based on these reviews, please provide:
 1. An overall score from 0.0 to 10.0
@@ -214,48 +519,139 @@ Based on these reviews, please provide:
 5. Top 3 weaknesses or areas for improvement
 
 Format your response as a JSON object with these keys: 'overall_score', 'aspect_scores', 'summary', 'strengths', 'weaknesses'.
+"""
+
+_BATCH_ANALYSIS_INSTRUCTIONS = """You are a hotel review analyst. Analyze the reviews of each hotel given at the end of this prompt and provide scores and insights for every hotel.
+
+For each hotel, based on its reviews, please provide:
+1. An overall score from 0.0 to 10.0
+2. Individual scores for each aspect (0.0 to 10.0)
+3. A brief summary of the hotel's quality (2-3 sentences)
+4. Top 3 strengths
+5. Top 3 weaknesses or areas for improvement
+
+Format your response as a JSON object keyed by the exact hotel name as given after "HOTEL:". Each value must be a JSON object with these keys: 'overall_score', 'aspect_scores', 'summary', 'strengths', 'weaknesses'.
+"""
+
+
+@lru_cache(maxsize=CACHE_MAXSIZE)
+@persistent_cache(f"gemini-analysis-v{GEMINI_PROMPT_VERSION}", ttl=ANALYSIS_CACHE_TTL, quiet=True)
+def _analyze_reviews_content_with_gemini(hotel_name: str, reviews_content: str, keywords: tuple) -> Dict[str, Any]:
+    """Send the prepared review content to Gemini Pro, memoized on (hotel, content, keywords). Logging is left to the caller."""
+    # Create a prompt for Gemini: the static instructions form a stable prefix, the hotel's reviews come last
+    prompt = f"""{_ANALYSIS_INSTRUCTIONS}
+Focus on these aspects: {', '.join(keywords)}
+
+Hotel: {hotel_name}
+
+Reviews:
+{reviews_content}
 """
     
-    print(f"Sending {len(reviews_content)} characters of review content to Gemini Pro...")
+    return _fill_analysis_defaults(_generate_gemini_json(prompt, max_output_tokens=2048))
+
+
+def analyze_reviews_with_gemini_batch(hotels_reviews: Dict[str, List[Dict[str, Any]]], keywords: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Analyze the reviews of several hotels with a single Gemini Pro request.
     
+    Args:
+        hotels_reviews: Mapping of hotel name to its list of review objects
+        keywords: List of keywords to focus on in the analysis
+        
+    Returns:
+        Dictionary mapping hotel name to its analysis; hotels missing from the model's answer are omitted
+    """
+    # Build one section per hotel; review count and length are capped so the prompt stays within context limits
+    hotels_content = tuple(
+        (hotel_name, "\n\n".join(_prompt_review_texts(reviews)))
+        for hotel_name, reviews in hotels_reviews.items()
+    )
+    return _analyze_hotels_content_with_gemini(hotels_content, tuple(keywords))
+
+
+@persistent_cache(f"gemini-batch-analysis-v{GEMINI_PROMPT_VERSION}", ttl=ANALYSIS_CACHE_TTL)
+def _analyze_hotels_content_with_gemini(hotels_content: tuple, keywords: tuple) -> Dict[str, Dict[str, Any]]:
+    """Send the prepared (hotel, review content) sections to Gemini Pro, cached on exactly what is sent."""
+    sections = "\n\n".join(f"=== HOTEL: {hotel_name} ===\n{content}" for hotel_name, content in hotels_content)
+    
+    # The static instructions form a stable prefix; the per-hotel sections come last
+    prompt = f"""{_BATCH_ANALYSIS_INSTRUCTIONS}
+Focus on these aspects: {', '.join(keywords)}
+
+{sections}
+"""
+    
+    print(f"Sending {len(sections)} characters of review content for {len(hotels_content)} hotels to Gemini Pro...")
+    
+    batch_analysis = _generate_gemini_json(prompt, max_output_tokens=8192)
+    
+    analyses = {}
+    for hotel_name, _ in hotels_content:
+        analysis = batch_analysis.get(hotel_name)
+        if isinstance(analysis, dict):
+            analyses[hotel_name] = _fill_analysis_defaults(analysis)
+    
+    print(f"Gemini Pro batch analysis complete for {len(analyses)}/{len(hotels_content)} hotels")
+    return analyses
+
+
+def _prompt_review_texts(reviews: List[Dict[str, Any]]) -> List[str]:
+    """Format up to GEMINI_MAX_REVIEWS distinct non-empty reviews for a prompt, each cut to GEMINI_REVIEW_CHARS, sorted by text."""
+    seen_hashes = set()
+    selected = []
+    for review in reviews:
+        text = review.get('text', '')[:GEMINI_REVIEW_CHARS]
+        if not text or hash(text) in seen_hashes:
+            continue
+        seen_hashes.add(hash(text))
+        selected.append((review.get('rating', 'N/A'), text))
+        if len(selected) == GEMINI_MAX_REVIEWS:
+            break
+    # Order by text so the same reviews always produce the same prompt (and analysis cache key)
+    selected.sort(key=itemgetter(1))
+    return [f"Review {i} (Rating: {rating}): {text}" for i, (rating, text) in enumerate(selected, 1)]
+
+
+def _generate_gemini_json(prompt: str, max_output_tokens: int) -> Dict[str, Any]:
+    """Send a prompt to Gemini and parse its answer as a JSON object."""
     # Set up the model configuration
     generation_config = {
         "temperature": 0.2,
         "top_p": 0.95,
         "top_k": 0,
-        "max_output_tokens": 2048,
+        "max_output_tokens": max_output_tokens,
     }
     
-    # Call the Gemini API
-    response = gemini_model.generate_content(prompt, generation_config=generation_config)
+    # Call the Gemini API, streaming so chunks are consumed while the model is still generating
+    response = _gemini_model().generate_content(prompt, generation_config=generation_config, stream=True)
     
     # Extract and parse the JSON response
-    analysis_text = response.text
+    analysis_text = "".join(chunk.text for chunk in response)
     
     # Clean up the response if needed (sometimes Gemini adds markdown code blocks)
-    if analysis_text.startswith("```json") and analysis_text.endswith("```"):
-        analysis_text = analysis_text[7:-3].strip()
-    elif analysis_text.startswith("```") and analysis_text.endswith("```"):
-        analysis_text = analysis_text[3:-3].strip()
+    fence_match = _CODE_FENCE_RE.match(analysis_text)
+    if fence_match:
+        analysis_text = fence_match.group(1)
     
     # Parse the JSON response
-    analysis = json.loads(analysis_text)
-    
-    # Validate and ensure all required keys are present
+    return _json_loads(analysis_text)
+
+
+def _fill_analysis_defaults(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate and ensure all required keys are present in a Gemini analysis."""
     required_keys = ['overall_score', 'aspect_scores', 'summary', 'strengths', 'weaknesses']
     for key in required_keys:
         if key not in analysis:
             analysis[key] = [] if key in ['strengths', 'weaknesses'] else \
                             {} if key == 'aspect_scores' else \
                             "No data" if key == 'summary' else 5.0
-    
-    print(f"Gemini Pro analysis complete for {hotel_name}")
     return analysis
 
 
-def analyze_reviews_with_local_method(hotel_name: str, reviews: List[Dict[str, Any]], keywords: List[str]) -> Dict[str, Any]:
-    """Analyze hotel reviews using a local method without external APIs"""
-    print(f"Using local method to analyze reviews for {hotel_name}...")
+def analyze_reviews_with_local_method(hotel_name: str, reviews: List[Dict[str, Any]], keywords: List[str], log: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Analyze hotel reviews using a local method without external APIs. Keywords are expected in lowercase."""
+    _log(log, f"Using local method to analyze reviews for {hotel_name}...")
     
     # Initialize the result structure
     result = {
@@ -271,13 +667,6 @@ def analyze_reviews_with_local_method(hotel_name: str, reviews: List[Dict[str, A
         result["summary"] = f"No reviews available for {hotel_name}."
         return result
     
-    # Count the number of reviews that mention each keyword
-    keyword_mentions = {}
-    for keyword in keywords:
-        count = sum(1 for r in reviews if keyword.lower() in r.get('text', '').lower())
-        if count > 0:
-            keyword_mentions[keyword] = count
-    
     # Calculate a simple sentiment score based on ratings
     ratings = []
     for review in reviews:
@@ -291,25 +680,48 @@ def analyze_reviews_with_local_method(hotel_name: str, reviews: List[Dict[str, A
     # Calculate average rating if available
     avg_rating = sum(ratings) / len(ratings) if ratings else 0.0
     
+    # Overall sentiment counts only matter when there is no usable rating to score from
+    need_overall_sentiment = not avg_rating > 0
+    
+    match_keywords = _compile_words_matcher(tuple(keywords))
+    
+    # Scan each review once, accumulating per-keyword mention counts split by the review's sentiment
+    keyword_hits = Counter()
+    positive_hits = Counter()
+    negative_hits = Counter()
+    positive_count = 0
+    negative_count = 0
+    for review in reviews:
+        text_l = review.get('text', '').lower()
+        hits = match_keywords(text_l) if match_keywords else ()
+        # Skip tokenizing reviews whose sentiment would not be used
+        if not hits and not need_overall_sentiment:
+            continue
+        tokens = set(_TOKEN_RE.findall(text_l))
+        has_positive = not POSITIVE_WORDS.isdisjoint(tokens)
+        has_negative = not NEGATIVE_WORDS.isdisjoint(tokens)
+        positive_count += has_positive
+        negative_count += has_negative
+        keyword_hits.update(hits)
+        # A review with both positive and negative words counts as a positive mention
+        if has_positive:
+            positive_hits.update(hits)
+        elif has_negative:
+            negative_hits.update(hits)
+    
+    # Count the number of reviews that mention each keyword
+    keyword_mentions = {}
+    for keyword in keywords:
+        count = keyword_hits[keyword]
+        if count > 0:
+            keyword_mentions[keyword] = count
+    
     # Convert to a 0-10 scale for consistency with Gemini output
     if avg_rating > 0:
         # Assuming ratings are on a 0-5 scale
         overall_score = (avg_rating / 5.0) * 10.0
     else:
         # If no ratings, estimate from positive/negative mentions
-        positive_words = ['good', 'great', 'excellent', 'amazing', 'love', 'best', 'perfect', 'wonderful', 'fantastic', 'awesome']
-        negative_words = ['bad', 'poor', 'terrible', 'awful', 'worst', 'horrible', 'disappointing', 'disappointed', 'not good', 'not great']
-        
-        positive_count = 0
-        negative_count = 0
-        
-        for r in reviews:
-            text = r.get('text', '').lower()
-            if any(pos in text for pos in positive_words):
-                positive_count += 1
-            if any(neg in text for neg in negative_words):
-                negative_count += 1
-        
         total = len(reviews)
         if total > 0:
             positive_ratio = positive_count / total
@@ -325,21 +737,9 @@ def analyze_reviews_with_local_method(hotel_name: str, reviews: List[Dict[str, A
         # Calculate a score based on mention frequency
         mention_ratio = count / len(reviews)
         
-        # Check if mentions are positive or negative
-        positive_words = ['good', 'great', 'excellent', 'amazing', 'love', 'best', 'perfect', 'wonderful', 'fantastic', 'awesome']
-        negative_words = ['bad', 'poor', 'terrible', 'awful', 'worst', 'horrible', 'disappointing', 'disappointed', 'not good', 'not great']
-        
-        positive_mentions = 0
-        negative_mentions = 0
-        
-        for review in reviews:
-            text = review.get('text', '').lower()
-            if keyword.lower() in text:
-                # Check if the mention is in a positive or negative context
-                if any(pos in text for pos in positive_words):
-                    positive_mentions += 1
-                elif any(neg in text for neg in negative_words):
-                    negative_mentions += 1
+        # Check if mentions are in a positive or negative context
+        positive_mentions = positive_hits[keyword]
+        negative_mentions = negative_hits[keyword]
         
         # Calculate aspect score based on positive vs negative mentions
         if positive_mentions + negative_mentions > 0:
@@ -399,6 +799,22 @@ def analyze_reviews_with_local_method(hotel_name: str, reviews: List[Dict[str, A
 
 # ========== LANGGRAPH AGENT NODES ==========
 
+# State keys a node must leave at least one of set so LangGraph registers a state update
+_REQUIRED_STATE_KEYS = frozenset({"location", "checkin", "checkout", "guests", "keywords", "google_data", "combined_hotels", "top_hotels"})
+
+
+def ensure_state(node):
+    """Decorator for graph nodes: if the returned state has none of the required keys, set a placeholder location."""
+    @wraps(node)
+    def wrapper(context: Dict[str, Any]) -> Dict[str, Any]:
+        context = node(context)
+        if _REQUIRED_STATE_KEYS.isdisjoint(context):
+            context["location"] = "Unknown"
+        return context
+    return wrapper
+
+
+@ensure_state
 def orchestrator(context: Dict[str, Any]) -> Dict[str, Any]:
     print("Orchestrator: Starting hotel recommendation pipeline...")
     # Always explicitly set these keys to guarantee a state update
@@ -407,17 +823,21 @@ def orchestrator(context: Dict[str, Any]) -> Dict[str, Any]:
     context["checkin"] = context.get("checkin", "2025-05-01")
     context["checkout"] = context.get("checkout", "2025-05-03")
     context["guests"] = context.get("guests", 2)
-    context["keywords"] = context.get("keywords", ["breakfast", "clean", "service", "location", "value"])
+    # Keywords are stored lowercase so downstream matching never has to lower them again
+    context["keywords"] = [k.lower() for k in context.get("keywords", ["breakfast", "clean", "service", "location", "value"])]
     
     print(f"Looking for hotels in {context['location']} with keywords: {', '.join(context['keywords'])}")
     
-    # Safeguard: ensure at least one required key is set
-    required_keys = ["location", "checkin", "checkout", "guests", "keywords", "google_data", "combined_hotels", "top_hotels"]
-    if not any(k in context for k in required_keys):
-        context["location"] = "Unknown"
     return context
 
 
+def _review_fingerprint(text: str) -> bytes:
+    """Return a compact digest of review text that ignores case and whitespace differences."""
+    normalized = _WHITESPACE_RE.sub(" ", text.strip().lower())
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).digest()
+
+
+@ensure_state
 def google_hotel_agent(context: Dict[str, Any]) -> Dict[str, Any]:
     print("Google Hotel Agent: Querying our hotel scraping server with Bright Data MCP API...")
     try:
@@ -442,6 +862,9 @@ def google_hotel_agent(context: Dict[str, Any]) -> Dict[str, Any]:
         # Step 2: For each hotel, fetch detailed reviews using the /hotel-reviews endpoint
         print(f"Step 2: Fetching detailed reviews for each hotel from /hotel-reviews endpoint...")
         hotels_with_reviews = []
+        named_hotels = []
+        # Total reviews across the hotels, accumulated as each hotel's reviews are merged
+        review_count = 0
         
         for i, hotel in enumerate(hotels[:5]):  # Limit to top 5 hotels to avoid too many requests
             hotel_name = hotel.get("name", "")
@@ -449,9 +872,17 @@ def google_hotel_agent(context: Dict[str, Any]) -> Dict[str, Any]:
                 continue
                 
             print(f"Processing hotel {i+1}/{min(5, len(hotels))}: {hotel_name}")
-            
-            # Fetch detailed reviews for this hotel
-            detailed_reviews = fetch_hotel_reviews(hotel_name, location, None, keywords)
+            named_hotels.append(hotel)
+        
+        # Fetch detailed reviews for all hotels concurrently; the shared session pools the connections
+        with ThreadPoolExecutor(max_workers=REVIEW_FETCH_MAX_WORKERS) as executor:
+            fetched = list(executor.map(
+                lambda hotel: fetch_hotel_reviews(hotel["name"], location, None, keywords),
+                named_hotels,
+            ))
+        
+        for hotel, detailed_reviews in zip(named_hotels, fetched):
+            hotel_name = hotel["name"]
             
             # Extract the reviews
             reviews = detailed_reviews.get("results", {}).get("reviews", [])
@@ -462,40 +893,118 @@ def google_hotel_agent(context: Dict[str, Any]) -> Dict[str, Any]:
                 hotel["detailed_reviews"] = reviews
                 # Combine the original reviews with the detailed reviews
                 all_reviews = hotel.get("reviews", []) + reviews
-                # Remove duplicates (based on text content)
-                seen_texts = set()
+                # Remove duplicates (based on a fingerprint of the normalized text, so the set doesn't hold full review strings)
+                seen_hashes = set()
                 unique_reviews = []
                 for review in all_reviews:
                     text = review.get("text", "")
-                    if text and text not in seen_texts:
-                        seen_texts.add(text)
+                    if not text:
+                        continue
+                    text_hash = _review_fingerprint(text)
+                    if text_hash not in seen_hashes:
+                        seen_hashes.add(text_hash)
                         unique_reviews.append(review)
                 hotel["reviews"] = unique_reviews
             
             hotels_with_reviews.append(hotel)
+            review_count += len(hotel.get("reviews", ()))
         
         # Update the context with the enhanced hotel data
         if hotels_with_reviews:
             result["results"]["hotels"] = hotels_with_reviews
             context["google_data"] = result
         
+        # The combiner reuses this count instead of re-walking the hotels
+        context["review_count"] = review_count
+        
         # Check if we have reviews and keywords
-        if keywords and hotels_with_reviews:
-            review_count = 0
-            for hotel in hotels_with_reviews:
-                reviews = hotel.get("reviews", [])
-                review_count += len(reviews)
+        if VERBOSE and keywords and hotels_with_reviews:
             print(f"Found a total of {review_count} reviews matching keywords: {', '.join(keywords)}")
     except Exception as e:
         print(f"Error in google_hotel_agent: {e}")
         context["google_data"] = {"error": str(e), "results": {"hotels": []}}
+        context["review_count"] = 0
     
-    # Safeguard: ensure at least one required key is set
-    required_keys = ["location", "checkin", "checkout", "guests", "keywords", "google_data", "combined_hotels", "top_hotels"]
-    if not any(k in context for k in required_keys):
-        context["location"] = "Unknown"
     return context
 
+
+def _hotel_reviews(hotel: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Return the reviews to score a hotel on, preferring detailed reviews if available."""
+    return hotel.get('detailed_reviews', []) or hotel.get('reviews', [])
+
+
+def _analyze_hotels_in_batches(hotels_reviews: Dict[str, List[Dict[str, Any]]], keywords: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Run batched Gemini analyses of GEMINI_BATCH_SIZE hotels each concurrently; failed batches are left out."""
+    items = list(hotels_reviews.items())
+    batches = [dict(items[i:i + GEMINI_BATCH_SIZE]) for i in range(0, len(items), GEMINI_BATCH_SIZE)]
+    
+    def run_batch(batch):
+        try:
+            return analyze_reviews_with_gemini_batch(batch, keywords)
+        except Exception as e:
+            print(f"Error in batched Gemini analysis of {', '.join(batch)}: {e}. Falling back to per-hotel analysis.")
+            return {}
+    
+    analyses = {}
+    with ThreadPoolExecutor(max_workers=SCORER_MAX_WORKERS) as executor:
+        for batch_analyses in executor.map(run_batch, batches):
+            analyses.update(batch_analyses)
+    return analyses
+
+
+def _score_one_hotel(hotel: Dict[str, Any], keywords: List[str], review_analysis: Optional[Dict[str, Any]] = None) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """
+    Build the scored entry for a single hotel (None if it has no reviews) along with its log lines.
+    
+    The reviews are analyzed here unless a precomputed review_analysis (e.g. from a batched Gemini call) is given.
+    Log lines are returned rather than printed so hotels scored concurrently don't interleave their output.
+    """
+    hotel_name = hotel.get('name', 'Unknown Hotel')
+    log = [f"\nScoring hotel: {hotel_name}"]
+    
+    reviews = _hotel_reviews(hotel)
+    
+    # Skip hotels with no reviews
+    if not reviews:
+        log.append(f"No reviews found for {hotel_name}. Skipping.")
+        return None, log
+    
+    # Analyze the reviews
+    if review_analysis is None:
+        review_analysis = analyze_hotel_reviews(hotel_name, reviews, keywords, log)
+    
+    # Calculate a final score (1-5 scale) based on the review analysis
+    overall_score = review_analysis.get('overall_score', 0.0)
+    final_score = round(overall_score / 2, 1)  # Convert from 10-point to 5-point scale
+    
+    # Create a scored hotel object
+    scored_hotel = {
+        'name': hotel_name,
+        'score': final_score,
+        'source': hotel.get('source', 'unknown'),
+        'address': hotel.get('address', ''),
+        'rating': hotel.get('rating', ''),
+        'price': hotel.get('price', ''),  # Include price if available
+        'reviews': reviews,
+        'review_count': len(reviews),
+        'llm_analysis': review_analysis
+    }
+    
+    # Record some information about the analysis
+    log.append(f"Analysis Overall Score: {review_analysis.get('overall_score')}/10.0")
+    log.append(f"Final Score: {scored_hotel['score']}/5.0")
+    log.append(f"Summary: {review_analysis.get('summary')}")
+    log.append(f"Reviews analyzed: {len(reviews)}")
+    
+    if review_analysis.get('aspect_scores'):
+        log.append("Aspect Scores:")
+        for aspect, score in review_analysis.get('aspect_scores', {}).items():
+            log.append(f"  - {aspect}: {score}/10.0")
+    
+    return scored_hotel, log
+
+
+@ensure_state
 def scorer_agent(context: Dict[str, Any]) -> Dict[str, Any]:
     print("Scorer Agent: Scoring and ranking hotels based on Google data and review analysis...")
     try:
@@ -508,11 +1017,11 @@ def scorer_agent(context: Dict[str, Any]) -> Dict[str, Any]:
         if not hotels_data:
             print("No hotel data found. Attempting to fetch hotels again...")
             try:
-                # Try to fetch hotels directly as a fallback
+                # Try to fetch hotels directly as a fallback, from the server rather than the cache
                 checkin = context.get("checkin", "2025-05-01")
                 checkout = context.get("checkout", "2025-05-03")
                 guests = context.get("guests", 2)
-                result = brightdata_mcp_query(location, checkin, checkout, guests, keywords)
+                result = brightdata_mcp_query(location, checkin, checkout, guests, keywords, use_cache=False)
                 hotels_data = result.get("results", {}).get("hotels", [])
                 if hotels_data:
                     print(f"Successfully fetched {len(hotels_data)} hotels as fallback")
@@ -557,60 +1066,29 @@ def scorer_agent(context: Dict[str, Any]) -> Dict[str, Any]:
             ]
             return context
         
-        # Process and score each hotel
-        scored_hotels = []
-        
+        # Analyze hotels with enough reviews in batched Gemini requests to amortize per-request latency
+        hotels_reviews = {}
         for hotel in hotels_data:
-            hotel_name = hotel.get('name', 'Unknown Hotel')
-            print(f"\nScoring hotel: {hotel_name}")
-            
-            # Extract reviews - prioritize detailed reviews if available
-            detailed_reviews = hotel.get('detailed_reviews', [])
-            original_reviews = hotel.get('reviews', [])
-            
-            # Use detailed reviews if available, otherwise use original reviews
-            reviews = detailed_reviews if detailed_reviews else original_reviews
-            
-            # Skip hotels with no reviews
-            if not reviews:
-                print(f"No reviews found for {hotel_name}. Skipping.")
-                continue
-            
-            # Analyze the reviews
-            review_analysis = analyze_hotel_reviews(hotel_name, reviews, keywords)
-            
-            # Calculate a final score (1-5 scale) based on the review analysis
-            overall_score = review_analysis.get('overall_score', 0.0)
-            final_score = round(overall_score / 2, 1)  # Convert from 10-point to 5-point scale
-            
-            # Create a scored hotel object
-            scored_hotel = {
-                'name': hotel_name,
-                'score': final_score,
-                'source': hotel.get('source', 'unknown'),
-                'address': hotel.get('address', ''),
-                'rating': hotel.get('rating', ''),
-                'price': hotel.get('price', ''),  # Include price if available
-                'reviews': reviews,
-                'review_count': len(reviews),
-                'llm_analysis': review_analysis
-            }
-            
-            # Print some information about the analysis
-            print(f"Analysis Overall Score: {review_analysis.get('overall_score')}/10.0")
-            print(f"Final Score: {scored_hotel['score']}/5.0")
-            print(f"Summary: {review_analysis.get('summary')}")
-            print(f"Reviews analyzed: {len(reviews)}")
-            
-            if review_analysis.get('aspect_scores'):
-                print("Aspect Scores:")
-                for aspect, score in review_analysis.get('aspect_scores', {}).items():
-                    print(f"  - {aspect}: {score}/10.0")
-            
-            scored_hotels.append(scored_hotel)
+            reviews = _hotel_reviews(hotel)
+            if _worth_gemini_analysis(reviews):
+                hotels_reviews[hotel.get('name', 'Unknown Hotel')] = reviews
+        batch_analyses = _analyze_hotels_in_batches(hotels_reviews, keywords) if hotels_reviews else {}
+        
+        # Score hotels concurrently; hotels without a batched analysis are analyzed individually
+        with ThreadPoolExecutor(max_workers=SCORER_MAX_WORKERS) as executor:
+            results = executor.map(
+                lambda h: _score_one_hotel(h, keywords, batch_analyses.get(h.get('name', 'Unknown Hotel'))),
+                hotels_data,
+            )
+            scored_hotels = []
+            # Flush each hotel's log in input order as its result arrives
+            for scored_hotel, log in results:
+                print("\n".join(log))
+                if scored_hotel is not None:
+                    scored_hotels.append(scored_hotel)
         
         # Sort hotels by score (highest first)
-        scored_hotels.sort(key=lambda x: x['score'], reverse=True)
+        scored_hotels.sort(key=itemgetter('score'), reverse=True)
         
         # Store the top hotels in context
         context['top_hotels'] = scored_hotels
@@ -621,22 +1099,16 @@ def scorer_agent(context: Dict[str, Any]) -> Dict[str, Any]:
             price_info = f" - Price: {hotel.get('price', 'N/A')}" if hotel.get('price') else ""
             print(f"{i+1}. {hotel['name']} - Score: {hotel['score']}/5.0{price_info} - Reviews: {hotel.get('review_count', 0)}")
         
-        # Save the hotel rankings to a file
-        save_hotel_rankings_to_file(scored_hotels)
-        
     except Exception as e:
         print(f"Error in scorer_agent: {e}")
         import traceback
         traceback.print_exc()
         context['top_hotels'] = []
     
-    # Safeguard: ensure at least one required key is set
-    required_keys = ["location", "checkin", "checkout", "guests", "keywords", "google_data", "combined_hotels", "top_hotels"]
-    if not any(k in context for k in required_keys):
-        context["location"] = "Unknown"
     return context
 
 
+@ensure_state
 def combiner_agent(context: Dict[str, Any]) -> Dict[str, Any]:
     print("Combiner Agent: Processing Google hotel data...")
     try:
@@ -654,174 +1126,444 @@ def combiner_agent(context: Dict[str, Any]) -> Dict[str, Any]:
         
         # Check if we have reviews and keywords
         keywords = context.get("keywords", [])
-        if keywords and hotels:
-            review_count = 0
-            for hotel in hotels:
-                reviews = hotel.get("reviews", [])
-                review_count += len(reviews)
-            print(f"Found a total of {review_count} reviews matching keywords: {', '.join(keywords)}")
+        if VERBOSE and keywords and hotels:
+            print(f"Found a total of {context.get('review_count', 0)} reviews matching keywords: {', '.join(keywords)}")
     except Exception as e:
         print(f"Error in combiner_agent: {e}")
         context["combined_hotels"] = {"error": str(e)}
     
-    # Safeguard: ensure at least one required key is set
-    required_keys = ["location", "checkin", "checkout", "guests", "keywords", "google_data", "combined_hotels", "top_hotels"]
-    if not any(k in context for k in required_keys):
-        context["location"] = "Unknown"
     return context
 
 
 # ========== LANGGRAPH SETUP ==========
-graph = StateGraph(state_schema=HotelContext)
-graph.add_node("orchestrator", orchestrator)
-graph.add_node("google_hotel_agent", google_hotel_agent)
-graph.add_node("combiner_agent", combiner_agent)
-graph.add_node("scorer_agent", scorer_agent)
-
-graph.add_edge("orchestrator", "google_hotel_agent")
-graph.add_edge("google_hotel_agent", "combiner_agent")
-graph.add_edge("combiner_agent", "scorer_agent")
-graph.add_edge("scorer_agent", END)
-
-graph.set_entry_point("orchestrator")
-
-
-def save_hotel_rankings_to_file(hotels, filename="hotel_rankings.txt"):
-    """Save hotel rankings to a file for easier viewing"""
-    with open(filename, "w") as f:
-        f.write("HOTEL RANKINGS WITH DETAILED ANALYSIS\n")
-        f.write("=" * 80 + "\n\n")
-        
-        for i, hotel in enumerate(hotels):
-            review_count = len(hotel.get('reviews', []))
-            review_sources = {}
-            for r in hotel.get('reviews', []):
-                source = r.get('source', 'unknown')
-                review_sources[source] = review_sources.get(source, 0) + 1
-            
-            analysis = hotel.get('llm_analysis', {})
-            
-            f.write(f"{i+1}. {hotel['name']}\n")
-            f.write(f"   Score: {hotel['score']}/5.0\n")
-            f.write(f"   Address: {hotel.get('address', 'N/A')}\n")
-            f.write(f"   Rating: {hotel.get('rating', 'N/A')}\n")
-            if hotel.get('price'):
-                f.write(f"   Price: {hotel.get('price')}\n")
+def build_graph():
+    """Build the hotel recommendation graph. LangGraph is imported here so it only loads when a search runs."""
+    from langgraph.graph import StateGraph, END
+    
+    graph = StateGraph(state_schema=HotelContext)
+    graph.add_node("orchestrator", orchestrator)
+    graph.add_node("google_hotel_agent", google_hotel_agent)
+    graph.add_node("combiner_agent", combiner_agent)
+    graph.add_node("scorer_agent", scorer_agent)
+    
+    graph.add_edge("orchestrator", "google_hotel_agent")
+    graph.add_edge("google_hotel_agent", "combiner_agent")
+    graph.add_edge("combiner_agent", "scorer_agent")
+    graph.add_edge("scorer_agent", END)
+    
+    graph.set_entry_point("orchestrator")
+    return graph
+
+
+def _is_successful_search(result: Dict[str, Any]) -> bool:
+    """
+    Whether a final graph state holds real rankings, rather than an error, an empty list or sample data.
+    
+    Rankings are rejected if the /hotels answer was a fallback (it carries a "note"), if the scorer fell back
+    to its sample hotel, or if any hotel was scored on the MCP server's sample reviews.
+    """
+    top_hotels = result.get("top_hotels")
+    google_data = result.get("google_data") or {}
+    if not top_hotels or "error" in google_data or "note" in google_data:
+        return False
+    return not any(hotel.get("source") == "sample" or _has_sample_reviews(hotel.get("reviews", ()))
+                   for hotel in top_hotels)
+
+
+def invoke_with_ranking_cache(compiled_graph, context: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Invoke the compiled graph, reusing the cached final state of an identical search made within CACHE_TTL.
+    
+    Searches are identified by location and keywords (case-insensitive, order-independent) plus dates and guests.
+    Only successful searches are cached, so a run made while the MCP server is down isn't replayed later.
+    """
+    if CACHE_TTL <= 0:
+        return compiled_graph.invoke(context)
+    
+    keywords = sorted({k.lower() for k in context.get("keywords", [])})
+    key_source = "|".join([
+        context.get("location", "").lower(),
+        str(context.get("checkin", "")),
+        str(context.get("checkout", "")),
+        str(context.get("guests", "")),
+        ",".join(keywords),
+    ])
+    key = f"ranking:{hashlib.sha256(key_source.encode()).hexdigest()}"
+    
+    try:
+        cached = _cache_get(key)
+    except Exception as e:
+        print(f"Error reading ranking cache: {e}")
+        cached = None
+    if cached is not None:
+        print("Using cached hotel rankings from a previous identical search")
+        return cached
+    
+    result = compiled_graph.invoke(context)
+    if not _is_successful_search(result):
+        return result
+    try:
+        _cache_set(key, result)
+    except Exception as e:
+        print(f"Error writing ranking cache: {e}")
+    return result
+
+
+@lru_cache(maxsize=1)
+def _compiled_graph():
+    """Compile the LangGraph pipeline once per process."""
+    return build_graph().compile()
+
+
+class _UnsuccessfulSearch(Exception):
+    """Raised out of _run_hotel_search_cached so lru_cache doesn't memoize a failed search; carries its result."""
+    
+    def __init__(self, result: Dict[str, Any]):
+        super().__init__("hotel search did not produce rankings")
+        self.result = result
+
+
+def run_hotel_search(location: str, checkin: str, checkout: str, guests: int, keywords: tuple, booking_url: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Run the hotel search pipeline and return its final state.
+    
+    Successful results are memoized per process on the search arguments (keywords as a tuple), so repeated
+    calls from a REPL or notebook don't re-run the graph. The returned state is shared; don't mutate it.
+    """
+    try:
+        return _run_hotel_search_cached(GRAPH_VERSION, location, checkin, checkout, guests, tuple(keywords), booking_url)
+    except _UnsuccessfulSearch as e:
+        return e.result
+
+
+@lru_cache(maxsize=32)
+def _run_hotel_search_cached(graph_version: int, location: str, checkin: str, checkout: str, guests: int, keywords: tuple, booking_url: Optional[str]) -> Dict[str, Any]:
+    """Memoized body of run_hotel_search; graph_version is part of the key so a version bump invalidates it."""
+    # Initial context with location and review keywords
+    context = {
+        "location": location,
+        "checkin": checkin,
+        "checkout": checkout,
+        "guests": guests,
+        "keywords": list(keywords),
+        "booking_url": booking_url
+    }
+    
+    # Invoke the graph with our context (or reuse the result of an identical recent search)
+    result = invoke_with_ranking_cache(_compiled_graph(), context)
+    if not _is_successful_search(result):
+        raise _UnsuccessfulSearch(result)
+    return result
+
+
+# Shared read-only stand-in for a missing analysis, so formatting hotels without one allocates nothing
+_EMPTY = MappingProxyType({})
+
+# Separator line used in the console summary and the rankings report, and the fixed text built from it
+_HDR = "=" * 80
+_HDR_LINE = _HDR + "\n"
+_SUMMARY_TITLE = f"\n{_HDR}\nHOTEL RANKINGS SUMMARY\n{_HDR}\n"
+_REPORT_SEP = _HDR + "\n\n"
+_REPORT_TITLE = "HOTEL RANKINGS WITH DETAILED ANALYSIS\n" + _REPORT_SEP
+
+
+def _use_large_stdout_buffer(buffer_size: int = STDOUT_BUFFER_SIZE) -> None:
+    """Rewrap a redirected (non-TTY) stdout with a larger block buffer; interactive output is left alone."""
+    # Leave interactive and explicitly unbuffered (python -u) output alone
+    if sys.stdout.isatty() or not isinstance(getattr(sys.stdout, "buffer", None), io.BufferedWriter):
+        return
+    sys.stdout.flush()
+    raw = sys.stdout.detach().detach()
+    sys.stdout = io.TextIOWrapper(io.BufferedWriter(raw, buffer_size=buffer_size), encoding="utf-8",
+                                  line_buffering=False, write_through=False)
+
+
+def _write_stdout(text: str) -> None:
+    """Write text to stdout, encoding it in one pass straight to the binary buffer when there is one."""
+    stream = sys.stdout
+    binary = getattr(stream, "buffer", None)
+    if binary is None:
+        stream.write(text)
+        stream.flush()
+        return
+    stream.flush()  # keep ordering with text already written through the wrapper
+    binary.write(text.encode(stream.encoding or "utf-8", stream.errors or "strict"))
+    binary.flush()
+
+
+class RankingWriter:
+    """
+    Output file for hotel rankings, opened once and kept open until closed.
+    
+    Rankings are written as a text report ("txt"), a JSON array ("json") or one JSON object per
+    line ("jsonl"). If no format is given it is inferred from the filename's extension. Filenames
+    ending in .gz are gzip-compressed (at the fastest level). Each write appends to the file.
+    """
+    
+    def __init__(self, filename: str, fmt: Optional[str] = None):
+        self.filename = filename
+        compressed = filename.endswith(".gz")
+        base = filename[:-3] if compressed else filename
+        self.format = fmt or {".json": "json", ".jsonl": "jsonl"}.get(os.path.splitext(base)[1], "txt")
+        self._raw = open(filename, "wb", buffering=1 << 20)
+        self._fp = gzip.GzipFile(fileobj=self._raw, mode="wb", compresslevel=1) if compressed else self._raw
+    
+    def write(self, hotels: Iterable[Dict[str, Any]]) -> None:
+        """Write one set of rankings and flush it to the file, consuming hotels lazily as they are written."""
+        if self.format == "json":
+            for chunk in _json_array_chunks(hotels):
+                self._fp.write(chunk)
+        elif self.format == "jsonl":
+            for hotel in hotels:
+                self._fp.write(_json_dumps(hotel) + b"\n")
+        else:
+            for chunk in _rankings_report_chunks(hotels):
+                self._fp.write(chunk.encode("utf-8"))
+        self._fp.flush()
+    
+    def close(self) -> None:
+        # Closing the gzip stream writes its trailer but leaves the underlying file open
+        self._fp.close()
+        self._raw.close()
+    
+    def __enter__(self) -> "RankingWriter":
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def save_hotel_rankings_to_file(hotels: Iterable[Dict[str, Any]], filename="hotel_rankings.txt"):
+    """Save hotel rankings to a file for easier viewing, or as JSON if the filename ends in .json"""
+    with RankingWriter(filename) as writer:
+        writer.write(hotels)
+    
+    print(f"Hotel rankings saved to {filename}")
+    return filename
+
+
+def _json_array_chunks(hotels: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """Serialize hotels as an indented JSON array one element at a time, matching _json_dumps_pretty of the list."""
+    first = True
+    for hotel in hotels:
+        # Nest the element one level deeper; JSON strings never contain raw newlines, so this only touches layout
+        yield (b"[\n  " if first else b",\n  ") + _json_dumps_pretty(hotel).replace(b"\n", b"\n  ")
+        first = False
+    yield b"[]" if first else b"\n]"
+
+
+def _rankings_report_chunks(hotels: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """Render the human-readable rankings report as a few large strings."""
+    # Join the hotel blocks into one string, writing once per REPORT_CHUNK_HOTELS hotels to bound memory
+    blocks = [_REPORT_TITLE]
+    for rank, hotel in enumerate(hotels, 1):
+        blocks.append(_format_hotel(rank, hotel))
+        if len(blocks) >= REPORT_CHUNK_HOTELS:
+            yield "".join(blocks)
+            blocks.clear()
+    
+    yield "".join(blocks)
+
+
+def _format_hotel(rank: int, hotel: Dict[str, Any]) -> str:
+    """Render one hotel's block of the rankings report."""
+    parts = []
+    append = parts.append
+    
+    reviews = hotel.get('reviews') or ()
+    review_count = len(reviews)
+    review_sources = {}
+    for r in reviews:
+        source = r.get('source', 'unknown')
+        review_sources[source] = review_sources.get(source, 0) + 1
+    
+    analysis = hotel.get('llm_analysis') or _EMPTY
+    
+    append(f"{rank}. {hotel['name']}\n")
+    append(f"   Score: {hotel['score']}/5.0\n")
+    append(f"   Address: {hotel.get('address', 'N/A')}\n")
+    append(f"   Rating: {hotel.get('rating', 'N/A')}\n")
+    if hotel.get('price'):
+        append(f"   Price: {hotel.get('price')}\n")
+    
+    # Write review source breakdown
+    append(f"   Reviews: {review_count} total")
+    if review_sources:
+        append(" (")
+        source_strings = [f"{count} from {source}" for source, count in review_sources.items()]
+        append(", ".join(source_strings))
+        append(")")
+    append("\n\n")
+    
+    # Write analysis details
+    if analysis:
+        append("ANALYSIS:\n")
+        append(f"Overall Score: {analysis.get('overall_score', 0.0)}/10.0\n")
+        append(f"Summary: {analysis.get('summary', 'No summary available')}\n\n")
+        
+        aspect_scores = analysis.get('aspect_scores')
+        if aspect_scores:
+            append("Aspect Scores:\n")
+            for aspect, score in aspect_scores.items():
+                append(f"- {aspect}: {score}/10.0\n")
+            append("\n")
+        
+        strengths = analysis.get('strengths')
+        if strengths:
+            append("Strengths:\n")
+            for strength in strengths:
+                append(f"+ {strength}\n")
+            append("\n")
+        
+        weaknesses = analysis.get('weaknesses')
+        if weaknesses:
+            append("Weaknesses:\n")
+            for weakness in weaknesses:
+                append(f"- {weakness}\n")
+            append("\n")
+    
+    # Write sample reviews
+    if reviews:
+        append("\nSAMPLE REVIEWS:\n")
+        for i, review in enumerate(islice(reviews, 5), 1):  # Show up to 5 reviews
+            # Look each field up once
+            source = review.get('source')
+            rating = review.get('rating')
+            author = review.get('author')
             
-            # Write review source breakdown
-            f.write(f"   Reviews: {review_count} total")
-            if review_sources:
-                f.write(" (")
-                source_strings = [f"{count} from {source}" for source, count in review_sources.items()]
-                f.write(", ".join(source_strings))
-                f.write(")")
-            f.write("\n\n")
+            source_info = f" (Source: {source})" if source else ""
+            append(f"Review {i}{source_info}: \"{review.get('text', 'No review text')}\"\n")
             
-            # Write analysis details
-            if analysis:
-                f.write("ANALYSIS:\n")
-                f.write(f"Overall Score: {analysis.get('overall_score', 0.0)}/10.0\n")
-                f.write(f"Summary: {analysis.get('summary', 'No summary available')}\n\n")
-                
-                if analysis.get('aspect_scores'):
-                    f.write("Aspect Scores:\n")
-                    for aspect, score in analysis.get('aspect_scores', {}).items():
-                        f.write(f"- {aspect}: {score}/10.0\n")
-                    f.write("\n")
-                
-                if analysis.get('strengths'):
-                    f.write("Strengths:\n")
-                    for strength in analysis.get('strengths', []):
-                        f.write(f"+ {strength}\n")
-                    f.write("\n")
+            # Add rating if available
+            if rating:
+                append(f"Rating: {rating}\n")
                 
-                if analysis.get('weaknesses'):
-                    f.write("Weaknesses:\n")
-                    for weakness in analysis.get('weaknesses', []):
-                        f.write(f"- {weakness}\n")
-                    f.write("\n")
-            
-            # Write sample reviews
-            if hotel.get('reviews'):
-                f.write("\nSAMPLE REVIEWS:\n")
-                for i, review in enumerate(hotel.get('reviews', [])[:5]):  # Show up to 5 reviews
-                    source_info = f" (Source: {review.get('source', 'unknown')})" if review.get('source') else ""
-                    f.write(f"Review {i+1}{source_info}: \"{review.get('text', 'No review text')}\"\n")
-                    
-                    # Add rating if available
-                    if review.get('rating'):
-                        f.write(f"Rating: {review.get('rating')}\n")
-                        
-                    # Add author and date if available
-                    if review.get('author'):
-                        f.write(f"- {review.get('author')}")
-                        if review.get('date'):
-                            f.write(f" ({review.get('date')})")
-                        f.write("\n")
-                    f.write("\n")
-            
-            f.write("=" * 80 + "\n\n")
+            # Add author and date if available
+            if author:
+                date = review.get('date')
+                append(f"- {author} ({date})\n" if date else f"- {author}\n")
+            append("\n")
     
-    print(f"Hotel rankings saved to {filename}")
-    return filename
+    append(_REPORT_SEP)
+    
+    return "".join(parts)
 
 
-if __name__ == "__main__":
+def _parse_keywords(value: str) -> Tuple[str, ...]:
+    """argparse type for --keywords: split a comma-separated list into a tuple of lowercase keywords."""
+    return tuple(k for k in (raw.strip().lower() for raw in value.split(',')) if k)
+
+
+async def main():
+    global CACHE_TTL
+    
     # Parse command-line arguments
     parser = argparse.ArgumentParser(description='Hotel Recommendation System with Gemini Pro')
     parser.add_argument('--location', '-l', type=str, default="New York", help='Location to search for hotels')
-    parser.add_argument('--keywords', '-k', type=str, default="breakfast,clean,service,location,value", 
+    parser.add_argument('--keywords', '-k', type=_parse_keywords, default="breakfast,clean,service,location,value", 
                         help='Comma-separated list of keywords to filter reviews by')
     parser.add_argument('--checkin', '-ci', type=str, default="2025-05-01", help='Check-in date (YYYY-MM-DD)')
     parser.add_argument('--checkout', '-co', type=str, default="2025-05-03", help='Check-out date (YYYY-MM-DD)')
     parser.add_argument('--guests', '-g', type=int, default=2, help='Number of guests')
-    parser.add_argument('--output', '-o', type=str, default="hotel_rankings.txt", help='Output file for detailed rankings')
+    parser.add_argument('--output', '-o', type=str, default="hotel_rankings.txt",
+                        help='Output file for detailed rankings (use a .json extension for machine-readable output)')
+    parser.add_argument('--format', '-f', choices=('txt', 'jsonl', 'both'),
+                        help='Rankings format; "both" also writes the JSONL next to the text report '
+                             '(default: inferred from the output extension)')
+    parser.add_argument('--compress', '-z', action='store_true',
+                        help='Gzip the rankings output (also enabled by an output name ending in .gz)')
     parser.add_argument('--booking-url', '-b', type=str, help='Direct Booking.com URL to fetch reviews from')
+    parser.add_argument('--top-k', '-t', type=int, default=5, help='Number of top hotels to show in the console summary')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Neither read nor write the on-disk cache of searches, MCP responses and analyses')
+    parser.add_argument('--cache-ttl', type=float, default=CACHE_TTL,
+                        help='Maximum age in seconds of cached searches and MCP responses to reuse (default: %(default)s)')
     
     args = parser.parse_args()
     
-    # Parse keywords
-    keywords = [k.strip() for k in args.keywords.split(',') if k.strip()]
+    # The cache helpers read the TTL at call time, so the flags apply to the whole run
+    CACHE_TTL = 0 if args.no_cache else args.cache_ttl
     
-    # Compile and run the graph (LangGraph 0.2.x+)
-    compiled_graph = graph.compile()
+    output = args.output
+    if args.compress and not output.endswith('.gz'):
+        output += '.gz'
     
-    # Initial context with location and review keywords
-    context = {
-        "location": args.location,
-        "checkin": args.checkin,
-        "checkout": args.checkout,
-        "guests": args.guests,
-        "keywords": keywords,
-        "booking_url": args.booking_url
-    }
+    if args.format == 'both':
+        base, gz = (output[:-3], '.gz') if output.endswith('.gz') else (output, '')
+        jsonl_output = os.path.splitext(base)[0] + '.jsonl' + gz
+        # The JSONL companion would overwrite the text report
+        if os.path.abspath(jsonl_output) == os.path.abspath(output):
+            parser.error(f"--format both writes a text report to --output; {args.output} would be overwritten "
+                         f"by the JSONL file, so use a different extension (e.g. .txt)")
+    
+    outputs = [(output, 'txt'), (jsonl_output, 'jsonl')] if args.format == 'both' else [(output, args.format)]
+    await _search_and_summarize(args, outputs)
+
+
+def _write_rankings(writers: List[RankingWriter], hotels: List[Dict[str, Any]]) -> None:
+    """Write the same rankings to every output file."""
+    for writer in writers:
+        writer.write(hotels)
+
+
+async def _search_and_summarize(args: argparse.Namespace, outputs: List[Tuple[str, Optional[str]]]) -> None:
+    """Run the search described by the CLI arguments, write the rankings to each (filename, format) output and print the summary."""
+    # argparse has already normalized the keywords; build their display string once
+    keywords = args.keywords
+    keywords_display = ', '.join(keywords)
     
-    print(f"\nSearching for hotels in {args.location} with keywords: {', '.join(keywords)}")
+    print(f"\nSearching for hotels in {args.location} with keywords: {keywords_display}")
     
-    # Invoke the graph with our context
-    result = compiled_graph.invoke(context)
+    # The graph nodes are synchronous, so run the search on a worker thread rather than blocking the event loop
+    result = await asyncio.to_thread(run_hotel_search, args.location, args.checkin, args.checkout,
+                                     args.guests, keywords, args.booking_url)
+    
+    # Open the rankings files only now, so a failed or interrupted search leaves previous rankings intact;
+    # they are closed once the summary is done
+    with ExitStack() as stack:
+        writers = [stack.enter_context(RankingWriter(filename, fmt)) for filename, fmt in outputs]
+        await _save_and_summarize(args, result, writers)
+
+
+async def _save_and_summarize(args: argparse.Namespace, result: Dict[str, Any], writers: List[RankingWriter]) -> None:
+    """Write the rankings to the open writers in the background while the console summary is printed."""
+    # Save detailed rankings to file in the background while the console summary is rendered
+    save_task = asyncio.create_task(asyncio.to_thread(_write_rankings, writers, result.get('top_hotels', [])))
     
-    # Save detailed rankings to file
-    output_file = save_hotel_rankings_to_file(result.get('top_hotels', []), args.output)
+    # Print a simplified summary to the console, assembled in a buffer and written at once
+    buf = io.StringIO()
+    buf.write(_SUMMARY_TITLE)
     
-    # Print a simplified summary to the console
-    print("\n" + "="*80)
-    print("HOTEL RANKINGS SUMMARY")
-    print("="*80)
+    # Only the best top_k hotels are shown; nlargest avoids sorting the whole list
+    top_hotels = heapq.nlargest(args.top_k, result.get('top_hotels', []), key=itemgetter('score'))
     
-    for i, hotel in enumerate(result.get('top_hotels', [])):
-        analysis = hotel.get('llm_analysis', {})
-        print(f"\n{i+1}. {hotel['name']}")
-        print(f"   Score: {hotel['score']}/5.0")
-        print(f"   Rating: {hotel.get('rating', 'N/A')}/5.0")
+    for rank, hotel in enumerate(top_hotels, 1):
+        analysis = hotel.get('llm_analysis') or _EMPTY
+        summary = analysis.get('summary')
+        strengths = analysis.get('strengths') or ()
+        buf.write(f"\n{rank}. {hotel['name']}\n")
+        buf.write(f"   Score: {hotel['score']}/5.0\n")
+        buf.write(f"   Rating: {hotel.get('rating', 'N/A')}/5.0\n")
         
-        # Print a brief summary
-        if analysis.get('summary'):
-            print(f"   Summary: {analysis.get('summary')[:100]}...")
+        # Print a brief summary, marked with an ellipsis only if it was actually cut
+        if summary:
+            summary = str(summary)
+            if len(summary) <= 100:
+                buf.write(f"   Summary: {summary}\n")
+            else:
+                buf.write(f"   Summary: {summary:.100}...\n")  # format-spec truncation, no intermediate slice
         
         # Print top strength if available
-        if analysis.get('strengths') and len(analysis.get('strengths')) > 0:
-            print(f"   Top strength: {analysis.get('strengths')[0]}")
+        if strengths:
+            buf.write(f"   Top strength: {strengths[0]}\n")
+    
+    await save_task
     
-    print(f"\nDetailed rankings saved to {output_file}")
-    print("="*80)
+    buf.write(f"\nDetailed rankings saved to {', '.join(writer.filename for writer in writers)}\n")
+    buf.write(_HDR_LINE)
+    _write_stdout(buf.getvalue())
+
+
+if __name__ == "__main__":
+    _use_large_stdout_buffer()
+    asyncio.run(main())